@@ -2,23 +2,70 @@ import asyncio
 import logging
 import os
 import re
-import base64
+import time
+import binascii
+import hashlib
+import functools
+
+try:
+    import pybase64
+    _b64encode_as_string = pybase64.b64encode_as_string
+except ImportError:
+    pybase64 = None
+
+    def _b64encode_as_string(data, _chunk=3 * 65536):
+        """Stdlib fallback: encode 192 KiB slices into one growing
+        bytearray. Peak memory stays near the output size instead of
+        holding input, encoded bytes and decoded str simultaneously as
+        base64.b64encode(data).decode() would. The slice length is a
+        multiple of 3, so no padding appears mid-stream."""
+        out = bytearray()
+        mv = memoryview(data)
+        for i in range(0, len(mv), _chunk):
+            out += binascii.b2a_base64(mv[i:i + _chunk], newline=False)
+        return out.decode('ascii')
+
+# Optional MessagePack support: binary media travels as a raw bin frame
+# instead of a base64 string, cutting the inline payload by a third
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Install uvloop at import so every loop in this process (including ones
+# created by hosting wrappers that never pass loop="uvloop") is libuv-backed
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
+import orjson
+from typing import Annotated, Union
 from datetime import datetime
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Query, Request
-from fastapi.responses import JSONResponse, HTMLResponse, Response, RedirectResponse
+from fastapi import FastAPI, HTTPException, Query, Request, Depends
+from fastapi.responses import ORJSONResponse, HTMLResponse, Response, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from starlette.middleware.gzip import GZipMiddleware
 from pyrogram import Client
+from pyrogram.file_id import FileId, FileType, ThumbnailSource
 from pyrogram.raw.functions.stories import GetStoriesByID
+from pyrogram.raw.types import MessageMediaPhoto, MessageMediaDocument
 import uvicorn
 
 # ============ Configuration ============
+# WARNING by default in production - INFO logging is a synchronous
+# stdout write on the event loop thread; opt back in via LOG_LEVEL
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv("LOG_LEVEL", "WARNING").upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+# Constant footer merged into every JSON payload
+_ENVELOPE = {"api_dev": "@ISmartCoder", "api_channel": "@abirxdhackz"}
+
 # Telegram credentials from environment variables (for Vercel)
 API_ID = int(os.getenv("API_ID", 28426910))
 API_HASH = os.getenv("API_HASH", "14824e6e01b1b6e6bef683c3e1797821")
@@ -26,122 +73,424 @@ SESSION_STRING = os.getenv("SESSION_STRING", "AQF722MAdGPFXOVUJ3QWo-FXtQSkKFMMhC
 
 # Initialize client
 user_client = None
+_client_ready = False
+_client_lock = None
 templates = Jinja2Templates(directory=".")
 
 # ============ Client Management ============
+def _build_client() -> Client:
+    """Single place for client construction so the perf knobs
+    (workers, no_updates, max_concurrent_transmissions) live together"""
+    # One dispatch worker and no updates stream: this proxy only uses
+    # invoke/download_media, so the 10-thread updates pool was idle
+    # weight on every cold start
+    return Client(
+        "telegram_stories",
+        api_id=API_ID,
+        api_hash=API_HASH,
+        session_string=SESSION_STRING,
+        in_memory=True,
+        workers=1,
+        no_updates=True,
+        # Parallel upload.GetFile sessions: large video stories
+        # download in concurrent 512KB chunk streams
+        max_concurrent_transmissions=8
+    )
+
 async def get_client():
     """Get or create Telegram client"""
-    global user_client
-    if user_client is None or not user_client.is_connected:
-        try:
-            user_client = Client(
-                "telegram_stories",
-                api_id=API_ID,
-                api_hash=API_HASH,
-                session_string=SESSION_STRING,
-                in_memory=True,
-                workers=10
-            )
-            await user_client.start()
-            me = await user_client.get_me()
-            logger.info(f"Client started as @{me.username}")
-        except Exception as e:
-            logger.error(f"Failed to start client: {e}")
-            user_client = None
-            raise
+    global user_client, _client_ready, _client_lock
+
+    # Fast path: a single module-level bool read; set once after a
+    # successful start and cleared on stop/failure
+    if _client_ready:
+        return user_client
+
+    # Created lazily so the lock binds to the running event loop
+    if _client_lock is None:
+        _client_lock = asyncio.Lock()
+
+    async with _client_lock:
+        # Re-check under the lock: another coroutine may have won the race
+        if user_client is None or not user_client.is_connected:
+            try:
+                user_client = _build_client()
+                await user_client.start()
+                me = await user_client.get_me()
+                logger.info(f"Client started as @{me.username}")
+                _client_ready = True
+            except Exception as e:
+                logger.error(f"Failed to start client: {e}")
+                user_client = None
+                _client_ready = False
+                raise
     return user_client
 
+# ============ Timestamp Formatting ============
+# Story timestamps repeat across requests (same story, check_batch
+# pages, retries), so memoize the rendered string
+@functools.lru_cache(maxsize=4096)
+def _fmt_ts(ts: int) -> str:
+    """Format a unix timestamp as 'YYYY-MM-DD HH:MM:SS' without the
+    locale-aware strftime machinery"""
+    t = time.localtime(ts)
+    return (f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d} "
+            f"{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}")
+
+# ============ Peer Cache ============
+# resolve_peer costs a Telegram round-trip; usernames rarely change, so
+# cache resolved peers for a few minutes
+_PEER_CACHE_TTL = 300
+# Failed lookups are remembered briefly too, so a storm of requests for
+# a bad username doesn't turn into a resolve RPC storm
+_PEER_CACHE_NEG_TTL = 20
+_PEER_CACHE_MAX = 1024
+_peer_cache = {}
+
+def _peer_cache_put(username, value, ttl):
+    if len(_peer_cache) >= _PEER_CACHE_MAX:
+        # Drop the oldest entry (dicts preserve insertion order)
+        _peer_cache.pop(next(iter(_peer_cache)))
+    _peer_cache[username] = (value, time.monotonic() + ttl)
+
+async def resolve_peer_cached(client, username):
+    """Resolve a peer, reusing a recently cached result (or failure)"""
+    # Telegram usernames are case-insensitive; normalize string keys so
+    # @User, user and USER share one cache entry (int channel IDs pass
+    # through untouched)
+    if isinstance(username, str):
+        username = username.lstrip('@').lower()
+    hit = _peer_cache.get(username)
+    if hit and hit[1] > time.monotonic():
+        if isinstance(hit[0], Exception):
+            raise hit[0]
+        return hit[0]
+
+    try:
+        peer = await client.resolve_peer(username)
+    except Exception as e:
+        _peer_cache_put(username, e, _PEER_CACHE_NEG_TTL)
+        raise
+
+    _peer_cache_put(username, peer, _PEER_CACHE_TTL)
+    return peer
+
 # ============ URL Parsing ============
+# Single fused pattern compiled once at import - covers t.me/telegram.me,
+# the /c/<chat>/<story> channel form, /<user>/s/<story> and /<user>/<story>
+_URL_RE = re.compile(
+    r'(?:t|telegram)\.me/'
+    r'(?:c/(?P<cid>\d+)/(?P<csid>\d+)'
+    r'|(?P<user>[^/]+)/(?:s/(?P<sid>\d+)|(?P<mid>\d+)$))',
+    re.IGNORECASE
+)
+
 def parse_story_url(url: str):
     """Parse Telegram story URL"""
-    patterns = [
-        r't\.me/([^/]+)/s/(\d+)',
-        r'telegram\.me/([^/]+)/s/(\d+)',
-        r't\.me/c/(\d+)/(\d+)',
-        r't\.me/([^/]+)/(\d+)$'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url, re.IGNORECASE)
-        if match:
-            if 'c/' in pattern:
-                chat_id = match.group(1)
-                story_id = int(match.group(2))
-                return f"-100{chat_id}", story_id
-            else:
-                username = match.group(1).lstrip('@')
-                story_id = int(match.group(2))
-                return username, story_id
-    return None, None
+    match = _URL_RE.search(url)
+    if not match:
+        return None, None
+
+    if match.group('cid'):
+        # Produce the -100-prefixed channel ID as an int directly;
+        # resolve_peer accepts it without re-parsing a string
+        return -(1000000000000 + int(match.group('cid'))), int(match.group('csid'))
+
+    username = match.group('user').lstrip('@')
+    story_id = int(match.group('sid') or match.group('mid'))
+    return username, story_id
+
+# ============ Media Classification ============
+# One dict probe on the MIME top-level type instead of substring checks,
+# and the download extension lives in the same table
+_MIME_KIND = {
+    'video': ('video', '.mp4'),
+    'image': ('image', '.jpg'),
+}
+
+def _classify(media):
+    """Classify story media into (media_type, mime_type, extension)"""
+    if isinstance(media, MessageMediaPhoto):
+        return "photo", "image/jpeg", ".jpg"
+    if isinstance(media, MessageMediaDocument):
+        mime_type = getattr(media.document, 'mime_type', None) or 'application/octet-stream'
+        media_type, extension = _MIME_KIND.get(mime_type.split('/', 1)[0], ('document', '.bin'))
+        return media_type, mime_type, extension
+    return "unknown", "application/octet-stream", ".bin"
+
+def _media_file_id(media):
+    """Encode raw story media into the file_id string stream_media and
+    download_media accept. GetStoriesByID returns raw TL descriptors,
+    which have no .file_id of their own; build one the same way
+    Photo._parse/Document._parse do. Returns None for unsupported media."""
+    if isinstance(media, MessageMediaPhoto) and media.photo is not None:
+        photo = media.photo
+        # Pick the largest size's type, as Photo._parse would
+        largest = max(
+            photo.sizes or [],
+            key=lambda s: getattr(s, 'size', None) or max(getattr(s, 'sizes', None) or (0,)),
+            default=None
+        )
+        if largest is None:
+            return None
+        return FileId(
+            file_type=FileType.PHOTO,
+            dc_id=photo.dc_id,
+            media_id=photo.id,
+            access_hash=photo.access_hash,
+            file_reference=photo.file_reference,
+            thumbnail_source=ThumbnailSource.THUMBNAIL,
+            thumbnail_file_type=FileType.PHOTO,
+            thumbnail_size=largest.type,
+            volume_id=0,
+            local_id=0
+        ).encode()
+    if isinstance(media, MessageMediaDocument) and media.document is not None:
+        doc = media.document
+        return FileId(
+            file_type=FileType.DOCUMENT,
+            dc_id=doc.dc_id,
+            media_id=doc.id,
+            access_hash=doc.access_hash,
+            file_reference=doc.file_reference
+        ).encode()
+    return None
 
 # ============ Story Download ============
-async def download_story(username: str, story_id: int, return_type: str = "json"):
+# Short-lived cache of fetched story objects so client retries and
+# check-then-download flows skip the GetStoriesByID round-trip. The TTL
+# stays well under Telegram's file-reference lifetime.
+_STORY_CACHE_TTL = 120
+_STORY_CACHE_MAX = 2048
+_story_cache = {}
+
+# Cap concurrent in-memory downloads: peak RAM is bounded by
+# limit x average media size, and Pyrogram's worker pool isn't thrashed
+# by a burst of simultaneous requests
+_download_sem = asyncio.Semaphore(8)
+
+# Pre-rendered skeleton for the json-branch response: the key layout is
+# constant, so fill value slots into the bytes template instead of
+# building an 11-key dict per request. String values are escaped by
+# passing them through orjson.dumps individually.
+_JSON_TMPL = (
+    b'{"success":true,"username":%b,"story_id":%d,"media_type":%b,'
+    b'"mime_type":%b,"size":%b,"download_url":%b,"direct_download":%b,'
+    b'"date":%b,"timestamp":%b,'
+    b'"api_dev":"@ISmartCoder","api_channel":"@abirxdhackz"}'
+)
+
+# Concurrent requests for the same story coalesce onto one download task
+# instead of each transferring the media from Telegram
+_inflight_downloads = {}
+
+# ============ Range Requests ============
+# Pyrogram streams media in fixed 1 MiB chunks; stream_media's offset and
+# limit parameters count those chunks, not bytes
+_STREAM_CHUNK = 1024 * 1024
+_RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)')
+
+def _parse_range(header, size):
+    """Parse a single bytes range into (start, end).
+
+    Returns None for anything that isn't one well-formed range (garbage,
+    multi-range, empty bounds) — RFC 9110 says to ignore those and serve
+    the full body. Raises ValueError for the one case that must produce
+    a 416: a well-formed range starting past the end of the file.
+    """
+    match = _RANGE_RE.fullmatch(header.strip())
+    if not match:
+        return None
+    start_s, end_s = match.groups()
+    if start_s:
+        start = int(start_s)
+        if start >= size:
+            raise ValueError("range starts past end of file")
+        end = min(int(end_s), size - 1) if end_s else size - 1
+    elif end_s:
+        # Suffix range: the last N bytes
+        start = max(size - int(end_s), 0)
+        end = size - 1
+    else:
+        return None
+    if start > end:
+        return None
+    return start, end
+
+async def _stream_range(client, file_id, start, end):
+    """Stream bytes [start, end] by fetching only the chunks that cover them"""
+    first = start // _STREAM_CHUNK
+    last = end // _STREAM_CHUNK
+    skip = start - first * _STREAM_CHUNK
+    remaining = end - start + 1
+    async for chunk in client.stream_media(file_id, offset=first, limit=last - first + 1):
+        if skip:
+            chunk = chunk[skip:]
+            skip = 0
+        if len(chunk) > remaining:
+            chunk = chunk[:remaining]
+        remaining -= len(chunk)
+        yield chunk
+        if remaining <= 0:
+            break
+
+async def _primed(first, rest):
+    """Replay an eagerly fetched first chunk, then the rest of the stream"""
+    if first:
+        yield first
+    async for chunk in rest:
+        yield chunk
+
+async def _download_media_bytes(client, cache_key, file_id):
+    """Download media to memory, sharing a single in-flight task per story"""
+    task = _inflight_downloads.get(cache_key)
+    if task is None:
+        async def _fetch():
+            async with _download_sem:
+                buf = await client.download_media(file_id, in_memory=True)
+                # in_memory=True yields a BytesIO; hand callers real
+                # bytes so len() and the encoders work on it directly
+                return bytes(buf.getbuffer()) if buf else None
+
+        task = asyncio.create_task(_fetch())
+        _inflight_downloads[cache_key] = task
+        task.add_done_callback(lambda _: _inflight_downloads.pop(cache_key, None))
+    return await task
+
+async def download_story(username: Union[str, int], story_id: int, return_type: str = "json", range_header: str = None):
     """Download story and return based on type"""
     try:
         client = await get_client()
         
         # Resolve peer
         try:
-            peer = await client.resolve_peer(username)
+            peer = await resolve_peer_cached(client, username)
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"User/channel not found: {e}")
         
         # Get story
         try:
-            result = await client.invoke(GetStoriesByID(peer=peer, id=[story_id]))
-            if not result or not hasattr(result, 'stories') or not result.stories:
-                raise HTTPException(status_code=404, detail="Story not found")
-            
-            story = result.stories[0]
-            
+            story_key = (username, story_id)
+            hit = _story_cache.get(story_key)
+            if hit and hit[1] > time.monotonic():
+                story = hit[0]
+            else:
+                result = await client.invoke(GetStoriesByID(peer=peer, id=[story_id]))
+                if not result or not getattr(result, 'stories', None):
+                    raise HTTPException(status_code=404, detail="Story not found")
+
+                story = result.stories[0]
+                if len(_story_cache) >= _STORY_CACHE_MAX:
+                    _story_cache.pop(next(iter(_story_cache)))
+                _story_cache[story_key] = (story, time.monotonic() + _STORY_CACHE_TTL)
+
+
             # Download media
-            if not hasattr(story, 'media'):
+            if getattr(story, 'media', None) is None:
                 raise HTTPException(status_code=404, detail="Story has no media")
             
-            # Download to bytes
-            file_bytes = await client.download_media(
-                story.media,
-                in_memory=True
-            )
-            
-            if not file_bytes:
-                raise HTTPException(status_code=500, detail="Failed to download media")
-            
             # Get media info
-            media_type = "unknown"
-            mime_type = "application/octet-stream"
-            
-            if hasattr(story.media, 'photo'):
-                media_type = "photo"
-                mime_type = "image/jpeg"
-            elif hasattr(story.media, 'document'):
-                doc = story.media.document
-                mime_type = getattr(doc, 'mime_type', 'application/octet-stream')
-                if 'video' in mime_type:
-                    media_type = "video"
-                elif 'image' in mime_type:
-                    media_type = "image"
-                else:
-                    media_type = "document"
-            
+            media_type, mime_type, extension = _classify(story.media)
+
             # Prepare response based on type
             if return_type == "file":
-                extension = ".jpg" if media_type == "photo" else ".mp4" if media_type == "video" else ".bin"
+                # Stream chunks as they arrive from Telegram instead of
+                # buffering the whole media in memory first
                 filename = f"story_{username}_{story_id}{extension}"
-                
-                return Response(
-                    content=file_bytes,
+
+                headers = {
+                    "Content-Disposition": f'attachment; filename="{filename}"'
+                }
+                file_id = _media_file_id(story.media)
+                if file_id is None:
+                    raise HTTPException(status_code=500, detail="Unsupported media type")
+
+                status_code = 200
+                stream = None
+                size = getattr(getattr(story.media, 'document', None), 'size', None)
+                if size:
+                    # Documents have a known size, so video players can seek
+                    # by requesting byte ranges instead of re-downloading
+                    headers["Accept-Ranges"] = "bytes"
+                    rng = None
+                    if range_header:
+                        try:
+                            rng = _parse_range(range_header, size)
+                        except ValueError:
+                            raise HTTPException(
+                                status_code=416,
+                                detail="Requested range not satisfiable",
+                                headers={"Content-Range": f"bytes */{size}"}
+                            )
+                    if rng:
+                        start, end = rng
+                        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                        headers["Content-Length"] = str(end - start + 1)
+                        status_code = 206
+                        stream = _stream_range(client, file_id, start, end)
+                    else:
+                        # Unparseable or unsupported Range headers are
+                        # ignored; the full body goes out as a normal 200
+                        headers["Content-Length"] = str(size)
+                if stream is None:
+                    stream = client.stream_media(file_id)
+
+                # Pull the first chunk before committing the response:
+                # a failure here surfaces as a clean HTTP error instead
+                # of aborting the body after the 200/206 already went out
+                try:
+                    first = await anext(stream)
+                except StopAsyncIteration:
+                    first = b""
+
+                return StreamingResponse(
+                    _primed(first, stream),
+                    status_code=status_code,
                     media_type=mime_type,
-                    headers={
-                        "Content-Disposition": f'attachment; filename="{filename}"',
-                        "Content-Length": str(len(file_bytes))
-                    }
+                    headers=headers
+                )
+
+            if return_type in ("base64", "msgpack"):
+                # Download to bytes (deduplicated across concurrent
+                # callers); download_media needs the encoded file_id just
+                # like stream_media does
+                file_id = _media_file_id(story.media)
+                if file_id is None:
+                    raise HTTPException(status_code=500, detail="Unsupported media type")
+                file_bytes = await _download_media_bytes(client, story_key, file_id)
+
+                if not file_bytes:
+                    raise HTTPException(status_code=500, detail="Failed to download media")
+
+                if return_type == "msgpack":
+                    # Raw bin frame: no base64 pass, no 33% inflation.
+                    # Clients decode with msgpack.unpackb(resp.content, raw=False)
+                    return Response(
+                        content=msgpack.packb({
+                            "success": True,
+                            "username": username,
+                            "story_id": story_id,
+                            "media_type": media_type,
+                            "mime_type": mime_type,
+                            "size": len(file_bytes),
+                            "data": file_bytes,
+                            "timestamp": datetime.now().isoformat(),
+                            **_ENVELOPE
+                        }, use_bin_type=True),
+                        media_type="application/msgpack"
+                    )
+
+                # SIMD-accelerated encode when pybase64 is available, stdlib
+                # otherwise. Run it in the default executor either way: a
+                # multi-MB encode would stall the event loop, and both
+                # encoders release the GIL in their C loops.
+                base64_data = await asyncio.get_running_loop().run_in_executor(
+                    None, _b64encode_as_string, file_bytes
                 )
-            
-            elif return_type == "base64":
-                base64_data = base64.b64encode(file_bytes).decode('utf-8')
                 
-                return JSONResponse({
+                # Plain dict: the app-wide default response class handles
+                # serialization without an explicit Response wrapper
+                return {
                     "success": True,
                     "username": username,
                     "story_id": story_id,
@@ -150,34 +499,40 @@ async def download_story(username: str, story_id: int, return_type: str = "json"
                     "size": len(file_bytes),
                     "data": base64_data,
                     "timestamp": datetime.now().isoformat(),
-                    "api_dev": "@ISmartCoder",
-                    "api_channel": "@abirxdhackz"
-                })
+                    **_ENVELOPE
+                }
             
             else:  # json - return URL
+                # Metadata-only: the size comes from the already-fetched
+                # story object, so no media transfer happens here at all
+                size = getattr(getattr(story.media, 'document', None), 'size', None)
+                if size is None:
+                    photo_sizes = getattr(getattr(story.media, 'photo', None), 'sizes', None) or []
+                    size = max((getattr(s, 'size', 0) for s in photo_sizes), default=None)
+
                 # For Vercel, we return a direct download link
                 download_url = f"/api/download?username={username}&storyid={story_id}"
-                
-                return JSONResponse({
-                    "success": True,
-                    "username": username,
-                    "story_id": story_id,
-                    "media_type": media_type,
-                    "mime_type": mime_type,
-                    "size": len(file_bytes),
-                    "download_url": download_url,
-                    "direct_download": f"https://{os.getenv('VERCEL_URL', '')}{download_url}",
-                    "date": datetime.fromtimestamp(story.date).strftime("%Y-%m-%d %H:%M:%S"),
-                    "timestamp": datetime.now().isoformat(),
-                    "api_dev": "@ISmartCoder",
-                    "api_channel": "@abirxdhackz"
-                })
+
+                body = _JSON_TMPL % (
+                    orjson.dumps(username),
+                    story_id,
+                    orjson.dumps(media_type),
+                    orjson.dumps(mime_type),
+                    orjson.dumps(size),
+                    orjson.dumps(download_url),
+                    orjson.dumps(f"https://{os.getenv('VERCEL_URL', '')}{download_url}"),
+                    orjson.dumps(_fmt_ts(story.date)),
+                    orjson.dumps(datetime.now().isoformat())
+                )
+                return Response(content=body, media_type="application/json")
                 
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Story download error: {str(e)}")
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in download_story: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -194,8 +549,10 @@ async def lifespan(app: FastAPI):
         logger.warning("Client initialization failed on startup")
     
     yield
-    
+
     # Shutdown
+    global _client_ready
+    _client_ready = False
     if user_client and user_client.is_connected:
         await user_client.stop()
         logger.info("Telegram client stopped")
@@ -204,14 +561,31 @@ app = FastAPI(
     title="Telegram Stories API",
     description="Download Telegram stories (photos & videos)",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Compress larger JSON payloads (base64 bodies shrink especially well);
+# small responses skip compression entirely
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # ============ Routes ============
-@app.get("/")
-async def home():
-    """Home page redirect to API docs"""
-    html_content = """
+# Shared query-parameter types so FastAPI builds one validator per shape
+# instead of re-deriving it per endpoint signature
+Username = Annotated[str, Query(min_length=1, max_length=64, description="Username or channel ID")]
+StoryId = Annotated[int, Query(ge=1, description="Story ID")]
+StoryUrl = Annotated[str, Query(description="Telegram story URL")]
+
+async def require_client():
+    """Ensure the Telegram client is up before the handler runs; failures
+    surface through the shared HTTPException envelope"""
+    try:
+        await get_client()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Telegram client unavailable: {e}")
+
+# Homepage is static - encode it once at import and serve constant bytes
+_HOME_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -260,100 +634,219 @@ async def home():
     </body>
     </html>
     """
-    return HTMLResponse(content=html_content)
+_HOME_BYTES = _HOME_HTML.encode('utf-8')
+_HOME_HEADERS = {
+    "Content-Length": str(len(_HOME_BYTES)),
+    "Cache-Control": "public, max-age=3600",
+    "ETag": f'"{hashlib.md5(_HOME_BYTES).hexdigest()}"'
+}
 
-@app.get("/api/direct")
-async def direct_download(url: str = Query(..., description="Telegram story URL")):
+@app.get("/")
+async def home():
+    """Home page redirect to API docs"""
+    return Response(
+        content=_HOME_BYTES,
+        media_type="text/html; charset=utf-8",
+        headers=_HOME_HEADERS
+    )
+
+# Constant error bodies rendered once at import: the miss path returns
+# prebuilt bytes with zero per-request dict construction or serialization
+_INVALID_URL_BODY = orjson.dumps({
+    "success": False,
+    "error": "Invalid URL format. Use: https://t.me/username/s/123456",
+    **_ENVELOPE
+})
+_UNHEALTHY_BODY = orjson.dumps(
+    {"status": "unhealthy", "error": "Telegram client not connected"}
+)
+
+@app.get("/api/direct", dependencies=[Depends(require_client)])
+async def direct_download(url: StoryUrl):
     """Download story from direct URL"""
     username, story_id = parse_story_url(url)
-    
+
     if not username or not story_id:
-        return JSONResponse(
+        return Response(
+            content=_INVALID_URL_BODY,
             status_code=400,
-            content={
-                "success": False,
-                "error": "Invalid URL format. Use: https://t.me/username/s/123456",
-                "api_dev": "@ISmartCoder",
-                "api_channel": "@abirxdhackz"
-            }
+            media_type="application/json"
         )
-    
+
     return await download_story(username, story_id, "json")
 
-@app.get("/api/download")
+@app.get("/api/download", dependencies=[Depends(require_client)])
 async def download_file(
-    username: str = Query(..., description="Username or channel ID"),
-    storyid: int = Query(..., description="Story ID")
+    request: Request,
+    username: Username,
+    storyid: StoryId
 ):
     """Download story as file"""
-    return await download_story(username, storyid, "file")
+    return await download_story(username, storyid, "file", request.headers.get("range"))
 
-@app.get("/api/base64")
+@app.get("/api/base64", dependencies=[Depends(require_client)])
 async def get_base64(
-    username: str = Query(..., description="Username or channel ID"),
-    storyid: int = Query(..., description="Story ID")
+    request: Request,
+    username: Username,
+    storyid: StoryId,
+    inline: int = Query(0, description="Set to 1 for the legacy inline base64 JSON")
 ):
-    """Get story as base64 encoded data"""
+    """Get story as base64 encoded data (deprecated - use /api/download)"""
+    # base64 inflates the payload by a third and peaks at ~3x the media
+    # size in RAM; point clients at the binary download unless they
+    # explicitly ask for the legacy inline payload
+    if not inline:
+        return RedirectResponse(
+            f"/api/download?username={username}&storyid={storyid}",
+            status_code=307,
+            headers={"Warning": '299 - "base64 endpoint deprecated, use /api/download"'}
+        )
+    # Clients that accept MessagePack get the media as a raw bin frame;
+    # everyone else keeps the backward-compatible base64 JSON
+    if msgpack is not None and "application/msgpack" in request.headers.get("accept", ""):
+        return await download_story(username, storyid, "msgpack")
     return await download_story(username, storyid, "base64")
 
-@app.get("/api/check")
+# Short response cache for /api/check: repeat checks for the same story
+# within a minute skip both Telegram RPCs
+_CHECK_CACHE_TTL = 60
+_CHECK_CACHE_MAX = 1024
+_check_cache = {}
+_CHECK_CACHE_HEADERS = {"Cache-Control": f"public, max-age={_CHECK_CACHE_TTL}"}
+
+@app.get("/api/check", dependencies=[Depends(require_client)])
 async def check_story(
-    username: str = Query(..., description="Username or channel ID"),
-    storyid: int = Query(..., description="Story ID")
+    request: Request,
+    username: Username,
+    storyid: StoryId
 ):
     """Check if story exists"""
+    cache_key = (username, storyid)
+    hit = _check_cache.get(cache_key)
+    if hit and hit[2] > time.monotonic():
+        body, etag = hit[0], hit[1]
+        # Revalidation: matching If-None-Match skips the body entirely
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag, **_CHECK_CACHE_HEADERS})
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={"ETag": etag, **_CHECK_CACHE_HEADERS}
+        )
+
     try:
         client = await get_client()
-        
+
         # Resolve peer
-        peer = await client.resolve_peer(username)
-        
+        peer = await resolve_peer_cached(client, username)
+
         # Get story
         result = await client.invoke(GetStoriesByID(peer=peer, id=[storyid]))
         
-        if not result or not hasattr(result, 'stories') or not result.stories:
-            return JSONResponse({
+        if not result or not getattr(result, 'stories', None):
+            return ORJSONResponse({
                 "success": False,
                 "exists": False,
                 "error": "Story not found",
-                "api_dev": "@ISmartCoder",
-                "api_channel": "@abirxdhackz"
+                **_ENVELOPE
             })
         
         story = result.stories[0]
-        
+
+        # Prime the story cache: a follow-up download for the same story
+        # (the common check-then-download flow) skips its GetStoriesByID
+        if len(_story_cache) >= _STORY_CACHE_MAX:
+            _story_cache.pop(next(iter(_story_cache)))
+        _story_cache[cache_key] = (story, time.monotonic() + _STORY_CACHE_TTL)
+
         # Get info
-        media_type = "unknown"
-        if hasattr(story, 'media'):
-            if hasattr(story.media, 'photo'):
-                media_type = "photo"
-            elif hasattr(story.media, 'document'):
-                doc = story.media.document
-                mime = getattr(doc, 'mime_type', '')
-                if 'video' in mime:
-                    media_type = "video"
-                elif 'image' in mime:
-                    media_type = "image"
+        media = getattr(story, 'media', None)
+        media_type = _classify(media)[0] if media is not None else "unknown"
         
-        return JSONResponse({
+        payload = {
             "success": True,
             "exists": True,
             "username": username,
             "story_id": storyid,
             "media_type": media_type,
-            "date": datetime.fromtimestamp(story.date).strftime("%Y-%m-%d %H:%M:%S"),
-            "has_media": hasattr(story, 'media'),
-            "api_dev": "@ISmartCoder",
-            "api_channel": "@abirxdhackz"
-        })
+            "date": _fmt_ts(story.date),
+            "has_media": media is not None,
+            **_ENVELOPE
+        }
+        # Cache the encoded bytes with a content-derived ETag so repeat
+        # hits skip re-serialization and revalidations can 304
+        body = orjson.dumps(payload)
+        etag = f'"{hashlib.blake2s(body, digest_size=8).hexdigest()}"'
+        if len(_check_cache) >= _CHECK_CACHE_MAX:
+            _check_cache.pop(next(iter(_check_cache)))
+        _check_cache[cache_key] = (body, etag, time.monotonic() + _CHECK_CACHE_TTL)
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={"ETag": etag, **_CHECK_CACHE_HEADERS}
+        )
         
     except Exception as e:
-        return JSONResponse({
+        return ORJSONResponse({
             "success": False,
             "exists": False,
             "error": str(e),
-            "api_dev": "@ISmartCoder",
-            "api_channel": "@abirxdhackz"
+            **_ENVELOPE
+        }, status_code=500)
+
+@app.get("/api/check_batch", dependencies=[Depends(require_client)])
+async def check_batch(
+    username: Username,
+    storyids: Annotated[str, Query(description="Comma-separated story IDs")]
+):
+    """Check several stories with a single batched Telegram call"""
+    try:
+        ids = [int(s) for s in storyids.split(',') if s.strip()]
+    except ValueError:
+        ids = []
+
+    if not ids or len(ids) > 100:
+        return ORJSONResponse(
+            status_code=400,
+            content={
+                "success": False,
+                "error": "storyids must be 1-100 comma-separated integers",
+                **_ENVELOPE
+            }
+        )
+
+    try:
+        client = await get_client()
+        peer = await resolve_peer_cached(client, username)
+
+        # GetStoriesByID takes a list, so N checks cost one round-trip
+        result = await client.invoke(GetStoriesByID(peer=peer, id=ids))
+
+        found = {}
+        if result and getattr(result, 'stories', None):
+            for story in result.stories:
+                media = getattr(story, 'media', None)
+                media_type = _classify(media)[0] if media is not None else "unknown"
+                found[story.id] = {
+                    "exists": True,
+                    "media_type": media_type,
+                    "date": _fmt_ts(story.date),
+                    "has_media": media is not None
+                }
+
+        return {
+            "success": True,
+            "username": username,
+            "count": len(found),
+            "stories": {str(i): found.get(i, {"exists": False}) for i in ids},
+            **_ENVELOPE
+        }
+
+    except Exception as e:
+        return ORJSONResponse({
+            "success": False,
+            "error": str(e),
+            **_ENVELOPE
         }, status_code=500)
 
 @app.get("/api/health")
@@ -371,22 +864,25 @@ async def health_check():
     except:
         pass
     
-    return JSONResponse(
+    return Response(
+        content=_UNHEALTHY_BODY,
         status_code=503,
-        content={"status": "unhealthy", "error": "Telegram client not connected"}
+        media_type="application/json"
     )
 
 # ============ Error Handlers ============
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "success": False,
             "error": exc.detail,
-            "api_dev": "@ISmartCoder",
-            "api_channel": "@abirxdhackz"
-        }
+            **_ENVELOPE
+        },
+        # Forward headers set on the exception (e.g. Content-Range on a
+        # 416), matching FastAPI's default handler
+        headers=exc.headers
     )
 
 # ============ Vercel Handler ============
@@ -396,4 +892,16 @@ app = app
 # For local development
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
+    # One worker per core so the CPU-bound base64/JSON encode paths scale;
+    # note reload=True and workers > 1 are mutually exclusive in uvicorn.
+    # Each worker logs into Telegram with its own client.
+    uvicorn.run(
+        "api:app",
+        host="0.0.0.0",
+        port=port,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+        access_log=False,
+        reload=False
+    )